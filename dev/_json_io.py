@@ -0,0 +1,32 @@
+"""
+JSON file helpers shared by the dev scripts.
+
+Reads parse with orjson when it is installed. Writes always use the stdlib
+encoder, so the files written are byte-for-byte the same with or without orjson
+(orjson writes non-ASCII text as raw UTF-8 and formats some floats differently).
+"""
+
+from pathlib import Path
+import json
+
+try:
+    import orjson  # Optional: faster parsing of TTS save files
+except ImportError:
+    orjson = None
+
+
+def load_json(path: Path):
+    """Load a JSON file, parsing with orjson when available."""
+    data = Path(path).read_bytes()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects a few inputs the stdlib accepts (NaN, BOM, huge ints)
+            pass
+    return json.loads(data)
+
+
+def dump_json(obj, path: Path):
+    """Write obj to path as 2-space indented JSON, encoded in memory and written once."""
+    Path(path).write_text(json.dumps(obj, indent=2), encoding='utf-8')
@@ -0,0 +1,101 @@
+"""
+Cached YAML loading shared by the dev scripts.
+
+Parsed documents are kept in an in-process LRU keyed by (mtime, size), and
+pickled to ~/.cache/kt-datacards keyed by a hash of the file contents so that
+repeated CLI runs (e.g. looping over every team) skip the YAML parse entirely.
+Set KT_DATACARDS_NO_YAML_CACHE=1 to skip the on-disk cache.
+"""
+
+from collections import OrderedDict
+from pathlib import Path
+import copy
+import hashlib
+import os
+import pickle
+import re
+
+# Parsed YAML files, keyed by a hash of their contents
+CACHE_DIR = Path.home() / '.cache' / 'kt-datacards'
+DISK_CACHE_ENABLED = not os.environ.get('KT_DATACARDS_NO_YAML_CACHE')
+
+# In-process cache: absolute path -> (mtime_ns, size, parsed)
+MAX_ENTRIES = 100
+_cache = OrderedDict()
+
+
+def _parse(data: bytes):
+    """Parse YAML bytes, using the libyaml C parser when available."""
+    import yaml
+    try:
+        from yaml import CSafeLoader as YamlLoader  # libyaml C parser
+    except ImportError:
+        from yaml import SafeLoader as YamlLoader
+    
+    return yaml.load(data, Loader=YamlLoader)
+
+
+def _load_uncached(path: Path):
+    """Load a YAML file through the on-disk pickle cache."""
+    data = path.read_bytes()
+    if not DISK_CACHE_ENABLED:
+        return _parse(data)
+    
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    cache_file = CACHE_DIR / f"{path.stem}-{digest}.pkl"
+    
+    if cache_file.exists():
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # A damaged or incompatible pickle is just a cache miss
+            pass
+    
+    parsed = _parse(data)
+    
+    # Cache is best-effort: write atomically, ignore failures
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+        
+        # Drop pickles of earlier versions of this file
+        stale_name = re.compile(re.escape(path.stem) + r'-[0-9a-f]{16}\.pkl')
+        for old_file in CACHE_DIR.iterdir():
+            if old_file != cache_file and stale_name.fullmatch(old_file.name):
+                old_file.unlink(missing_ok=True)
+    except OSError:
+        pass
+    
+    return parsed
+
+
+def load_yaml(path: Path):
+    """
+    Load a YAML file, reusing a previous parse when the file is unchanged.
+    
+    Args:
+        path: YAML file to load
+    
+    Returns:
+        Parsed document (a fresh copy the caller may mutate)
+    """
+    path = Path(path).resolve()
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    
+    entry = _cache.get(path)
+    if entry is not None and entry[0] == key:
+        _cache.move_to_end(path)
+        parsed = entry[1]
+    else:
+        parsed = _load_uncached(path)
+        _cache[path] = (key, parsed)
+        _cache.move_to_end(path)
+        if len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+    
+    return copy.deepcopy(parsed)
@@ -16,6 +16,7 @@ import numpy as np
 import cv2
 from typing import List, Tuple, Dict
 import json
+from concurrent.futures import ThreadPoolExecutor
 import pytesseract
 import fitz  # PyMuPDF
 import re
@@ -24,11 +25,14 @@ import re
 class TokenExtractor:
     """Extract individual tokens from marker/token guide images."""
     
-    def __init__(self, output_base_dir: Path):
+    def __init__(self, output_base_dir: Path, png_compression: int = 1):
         self.output_base_dir = output_base_dir
+        # zlib level for extracted token PNGs (0-9); low by default since these are intermediate files
+        self.png_compression = png_compression
         self.output_base_dir.mkdir(exist_ok=True, parents=True)
     
-    def extract_text_from_pdf(self, pdf_path: Path, page_num: int = -1, target_image_path: Path = None) -> Dict[Tuple[int, int], str]:
+    def extract_text_from_pdf(self, pdf_path: Path, page_num: int = -1, target_image_path: Path = None,
+                              target_size: Tuple[int, int] = None) -> Dict[Tuple[int, int], str]:
         """
         Extract text with positions from a PDF page (marker guide page).
         
@@ -36,6 +40,8 @@ class TokenExtractor:
             pdf_path: Path to the PDF file
             page_num: Page number (0-indexed), -1 for last page (marker guide is usually last)
             target_image_path: Path to the target JPG image for coordinate scaling
+            target_size: (width, height) of the target image, if already known.
+                Takes precedence over target_image_path and avoids re-reading the image.
         
         Returns:
             Dict mapping (x, y) to text strings (scaled to match target image if provided)
@@ -62,12 +68,14 @@ class TokenExtractor:
             # Get target image dimensions for scaling
             scale_x = 1.0
             scale_y = 1.0
-            if target_image_path and target_image_path.exists():
-                img = cv2.imread(str(target_image_path))
-                if img is not None:
-                    img_height, img_width = img.shape[:2]
-                    scale_x = img_width / pdf_width
-                    scale_y = img_height / pdf_height
+            if target_size is None and target_image_path and target_image_path.exists():
+                # Only the header is read here; no need to decode the full image
+                with Image.open(target_image_path) as target_img:
+                    target_size = target_img.size
+            if target_size is not None:
+                img_width, img_height = target_size
+                scale_x = img_width / pdf_width
+                scale_y = img_height / pdf_height
             
             # Extract text with positions
             text_data = page.get_text("words")  # Returns list of (x0, y0, x1, y1, "word", block_no, line_no, word_no)
@@ -96,22 +104,28 @@ class TokenExtractor:
                     group_x_max = x1
                 else:
                     prev_x, prev_y = current_pos
-                    
-                    # Calculate gap from previous word's right edge to this word's left edge
-                    gap = abs(x0 - last_x1)
                     y_diff = abs(center_y - prev_y)
                     
-                    # Check if x positions overlap with current group (for multi-line names)
-                    x_overlap = (x0 <= group_x_max and x1 >= group_x_min)
-                    
-                    # Same line with small gap = same token name
-                    same_line = y_diff < 15 * scale_y and gap < 10
-                    
-                    # Next line with overlapping x = continuation of multi-line token name
-                    # Multi-line names have y_diff of ~11 PDF units (~45px)
-                    next_line_continuation = (y_diff > 5 * scale_y and y_diff < 25 * scale_y and x_overlap)
+                    # Words 25+ units away vertically can never join the group,
+                    # so skip the gap/overlap checks for them
+                    joins_group = False
+                    if y_diff < 25 * scale_y:
+                        # Calculate gap from previous word's right edge to this word's left edge
+                        gap = abs(x0 - last_x1)
+                        
+                        # Check if x positions overlap with current group (for multi-line names)
+                        x_overlap = (x0 <= group_x_max and x1 >= group_x_min)
+                        
+                        # Same line with small gap = same token name
+                        same_line = y_diff < 15 * scale_y and gap < 10
+                        
+                        # Next line with overlapping x = continuation of multi-line token name
+                        # Multi-line names have y_diff of ~11 PDF units (~45px)
+                        next_line_continuation = (y_diff > 5 * scale_y and x_overlap)
+                        
+                        joins_group = same_line or next_line_continuation
                     
-                    if same_line or next_line_continuation:
+                    if joins_group:
                         current_group.append(word)
                         current_pos = ((prev_x + center_x) // 2, (prev_y + center_y) // 2)
                         last_x1 = x1  # Update right edge
@@ -166,14 +180,24 @@ class TokenExtractor:
             Path("output_v2") / "xenos" / team_name / "faction-rules",
         ]
         
+        def guide_priority(path: Path) -> Tuple[int, str]:
+            # Prefer 'markertoken-guide', then 'marker-token-guide', then any 'token-guide'
+            if 'markertoken-guide' in path.name:
+                return (0, path.name)
+            if 'marker-token-guide' in path.name:
+                return (1, path.name)
+            return (2, path.name)
+        
         for search_path in search_paths:
             if search_path.exists():
-                # Look for marker/token guide files
-                marker_files = list(search_path.glob("*markertoken-guide*_front.jpg")) + \
-                              list(search_path.glob("*marker-token-guide*_front.jpg")) + \
-                              list(search_path.glob("*token-guide*_front.jpg"))
+                # Look for marker/token guide files in a single directory listing
+                # ('token-guide' also covers both marker guide spellings)
+                marker_files = [
+                    p for p in search_path.iterdir()
+                    if p.name.endswith('_front.jpg') and 'token-guide' in p.name
+                ]
                 if marker_files:
-                    return marker_files[0]
+                    return min(marker_files, key=guide_priority)
         
         return None
     
@@ -246,8 +270,22 @@ class TokenExtractor:
         
         return token_names
     
+    def build_label_index(self, token_names: Dict[Tuple[int, int], str]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Convert text label positions to arrays for vectorized matching.
+        
+        Args:
+            token_names: Dict of (x, y) -> name from OCR
+        
+        Returns:
+            (N, 2) float array of label positions and the matching list of names
+        """
+        label_xy = np.array(list(token_names.keys()), dtype=np.float64).reshape(-1, 2)
+        return label_xy, list(token_names.values())
+    
     def match_token_to_name(self, token_bbox: Tuple[int, int, int, int], 
-                           token_names: Dict[Tuple[int, int], str]) -> str:
+                           token_names: Dict[Tuple[int, int], str],
+                           label_index: Tuple[np.ndarray, List[str]] = None) -> str:
         """
         Match a token bounding box to its name based on proximity.
         Text is typically to the right or below the token.
@@ -255,6 +293,8 @@ class TokenExtractor:
         Args:
             token_bbox: (x, y, width, height) of token
             token_names: Dict of (x, y) -> name from OCR
+            label_index: Optional result of build_label_index(token_names), so
+                callers matching many tokens only build the arrays once
         
         Returns:
             Best matching token name or 'unknown'
@@ -262,36 +302,36 @@ class TokenExtractor:
         if not token_names:
             return 'unknown'
         
+        if label_index is None:
+            label_index = self.build_label_index(token_names)
+        label_xy, label_names = label_index
+        name_x = label_xy[:, 0]
+        name_y = label_xy[:, 1]
+        
         x, y, w, h = token_bbox
         token_center_x = x + w // 2
         token_center_y = y + h // 2
         token_right = x + w
         token_bottom = y + h
         
-        # Find text to the right or below the token
-        best_match = None
-        best_distance = float('inf')
+        # Find text to the right (within reasonable vertical range)
+        is_to_right = (name_x > token_right) & (np.abs(name_y - token_center_y) < h * 0.8)
         
-        for (name_x, name_y), name in token_names.items():
-            # Check if text is to the right (within reasonable vertical range)
-            is_to_right = (name_x > token_right and 
-                          abs(name_y - token_center_y) < h * 0.8)
+        # Or below (within reasonable horizontal range)
+        is_below = (name_y > token_bottom) & (np.abs(name_x - token_center_x) < w * 0.8)
+        
+        candidates = is_to_right | is_below
+        best_match = None
+        if candidates.any():
+            dx = name_x - token_center_x
+            dy = name_y - token_center_y
+            distance = np.sqrt(dx * dx + dy * dy)
             
-            # Check if text is below (within reasonable horizontal range)
-            is_below = (name_y > token_bottom and 
-                       abs(name_x - token_center_x) < w * 0.8)
+            # Prefer closer matches, but prioritize text to the right over text below
+            distance = np.where(is_to_right, distance * 0.8, distance)
+            distance[~candidates] = np.inf
             
-            if is_to_right or is_below:
-                # Calculate distance
-                distance = ((name_x - token_center_x) ** 2 + (name_y - token_center_y) ** 2) ** 0.5
-                
-                # Prefer closer matches, but prioritize text to the right over text below
-                if is_to_right:
-                    distance *= 0.8  # Prefer right-side text
-                
-                if distance < best_distance:
-                    best_match = name
-                    best_distance = distance
+            best_match = label_names[int(np.argmin(distance))]
         
         # Clean up the matched name
         if best_match:
@@ -357,41 +397,6 @@ class TokenExtractor:
         
         return 'unknown'
     
-    def match_token_to_name(self, token_bbox: Tuple[int, int, int, int], 
-                           token_names: Dict[Tuple[int, int], str]) -> str:
-        """
-        Match a token bounding box to its name based on proximity.
-        
-        Args:
-            token_bbox: (x, y, width, height) of token
-            token_names: Dict of (x, y) -> name from OCR
-        
-        Returns:
-            Best matching token name or 'unknown'
-        """
-        if not token_names:
-            return 'unknown'
-        
-        x, y, w, h = token_bbox
-        token_center_x = x + w // 2
-        token_center_y = y + h // 2
-        
-        # Find closest name
-        best_match = None
-        best_distance = float('inf')
-        
-        for (name_x, name_y), name in token_names.items():
-            # Calculate distance
-            distance = ((name_x - token_center_x) ** 2 + (name_y - token_center_y) ** 2) ** 0.5
-            
-            # Prioritize names that are close and below/beside the token
-            # Token names are typically directly below or beside the token image
-            if distance < best_distance and distance < 300:  # Within reasonable proximity
-                best_match = name
-                best_distance = distance
-        
-        return best_match if best_match else 'unknown'
-    
     def extract_tokens_auto(self, 
                            image_path: Path, 
                            output_dir: Path,
@@ -425,7 +430,7 @@ class TokenExtractor:
             
             if pdf_path and pdf_path.exists():
                 print(f"  Extracting text from PDF: {pdf_path.name}")
-                token_names_ocr = self.extract_text_from_pdf(pdf_path, target_image_path=image_path)
+                token_names_ocr = self.extract_text_from_pdf(pdf_path, target_size=(img.shape[1], img.shape[0]))
                 print(f"  Found {len(token_names_ocr)} text labels from PDF")
             else:
                 # Fallback to OCR on image
@@ -451,27 +456,22 @@ class TokenExtractor:
         min_area = 1000  # Minimum pixel area for a token
         max_aspect_ratio = 3.0  # Filter out very wide elements (like remaining headers)
         
-        token_contours = []
-        for c in contours:
-            area = cv2.contourArea(c)
-            if area < min_area:
-                continue
-            
-            # Check aspect ratio to filter out header-like elements
-            x, y, w, h = cv2.boundingRect(c)
-            aspect_ratio = w / h if h > 0 else 0
-            
-            # Skip if too wide (likely a header or text row)
-            if aspect_ratio > max_aspect_ratio:
-                continue
-                
-            token_contours.append(c)
+        # Area filter in one vectorized pass; bounding boxes only for survivors
+        areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+        keep = np.flatnonzero(areas >= min_area)
+        rects = np.array([cv2.boundingRect(contours[i]) for i in keep], dtype=np.int32).reshape(-1, 4)
+        
+        # Skip if too wide (likely a header or text row)
+        widths, heights = rects[:, 2], rects[:, 3]
+        not_too_wide = (heights == 0) | (widths <= max_aspect_ratio * heights)
+        keep = keep[not_too_wide]
+        rects = rects[not_too_wide]
         
         # Sort contours by position (top to bottom, left to right)
-        token_contours = sorted(token_contours, key=lambda c: (
-            cv2.boundingRect(c)[1],  # y position
-            cv2.boundingRect(c)[0]   # x position
-        ))
+        order = np.lexsort((rects[:, 0], rects[:, 1]))  # primary key y, secondary x
+        token_contours = [contours[i] for i in keep[order]]
+        token_areas = areas[keep[order]]
+        rects = rects[order]
         
         # Extract tokens
         extracted_tokens = []
@@ -480,76 +480,93 @@ class TokenExtractor:
         if debug:
             debug_img = img.copy()
         
-        for idx, contour in enumerate(token_contours):
-            # Get bounding box (relative to cropped image)
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Adjust y coordinate to account for skipped header
-            y_actual = y + skip_pixels
-            
-            # Match token to nearby text (to the right or below)
-            token_name = 'unknown'
-            if extract_names:
-                token_name = self.match_token_to_name((x, y_actual, w, h), token_names_ocr)
-            
-            # Clean up name for filename
-            if token_name and token_name != 'unknown':
-                safe_name = re.sub(r'[^a-z0-9\-]', '-', token_name.lower())
-                safe_name = re.sub(r'-+', '-', safe_name).strip('-')
-            else:
-                safe_name = f"token-{idx:02d}"
-            
-            # Add padding
-            padding = 10
-            x_pad = max(0, x - padding)
-            y_pad = max(0, y_actual - padding)
-            w_pad = min(img.shape[1] - x_pad, w + 2 * padding)
-            h_pad = min(img.shape[0] - y_pad, h + 2 * padding)
-            
-            # Extract token from original image
-            token_img = img[y_pad:y_pad+h_pad, x_pad:x_pad+w_pad]
-            
-            # Determine shape based on circularity
-            area = cv2.contourArea(contour)
-            perimeter = cv2.arcLength(contour, True)
-            circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0
-            aspect_ratio = w / h if h > 0 else 0
-            
-            if circularity >= 0.75 and 0.9 <= aspect_ratio <= 1.1:
-                shape = "round"
-            else:
-                shape = "operative"
-            
-            # Save
-            output_path = output_dir / f"{safe_name}.png"
-            cv2.imwrite(str(output_path), token_img)
-            
-            token_info = {
-                'path': output_path,
-                'name': token_name,
-                'safe_name': safe_name,
-                'shape': shape,
-                'dimensions': {'width': w, 'height': h},
-                'circularity': round(circularity, 3)
-            }
-            extracted_tokens.append(token_info)
-            
-            if debug:
-                cv2.rectangle(debug_img, (x, y_actual), (x+w, y_actual+h), (0, 255, 0), 2)
-                label = f"{safe_name[:15]}" if token_name != 'unknown' else str(idx)
-                cv2.putText(debug_img, label, (x, y_actual-5), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
-            
-            
-            # Draw OCR text positions
-            if debug and token_names_ocr:
+        # Label positions as arrays, built once for all tokens
+        label_index = self.build_label_index(token_names_ocr) if extract_names and token_names_ocr else None
+        
+        # PNG encoding releases the GIL, so overlap writes with contour processing
+        write_jobs = {}  # output path -> pending write
+        with ThreadPoolExecutor(max_workers=4) as writer:
+            for idx, (contour, (x, y, w, h), area) in enumerate(
+                    zip(token_contours, rects.tolist(), token_areas.tolist())):
+                # Bounding box (x, y, w, h) is relative to cropped image
+                
+                # Adjust y coordinate to account for skipped header
+                y_actual = y + skip_pixels
+                
+                # Match token to nearby text (to the right or below)
+                token_name = 'unknown'
+                if extract_names:
+                    token_name = self.match_token_to_name((x, y_actual, w, h), token_names_ocr,
+                                                          label_index=label_index)
+                
+                # Clean up name for filename
+                if token_name and token_name != 'unknown':
+                    safe_name = re.sub(r'[^a-z0-9\-]', '-', token_name.lower())
+                    safe_name = re.sub(r'-+', '-', safe_name).strip('-')
+                else:
+                    safe_name = f"token-{idx:02d}"
+                
+                # Add padding
+                padding = 10
+                x_pad = max(0, x - padding)
+                y_pad = max(0, y_actual - padding)
+                w_pad = min(img.shape[1] - x_pad, w + 2 * padding)
+                h_pad = min(img.shape[0] - y_pad, h + 2 * padding)
+                
+                # Extract token from original image
+                token_img = img[y_pad:y_pad+h_pad, x_pad:x_pad+w_pad]
+                
+                # Determine shape based on circularity
+                perimeter = cv2.arcLength(contour, True)
+                circularity = (4 * np.pi * area) / (perimeter ** 2) if perimeter > 0 else 0
+                aspect_ratio = w / h if h > 0 else 0
+                
+                if circularity >= 0.75 and 0.9 <= aspect_ratio <= 1.1:
+                    shape = "round"
+                else:
+                    shape = "operative"
+                
+                # Save
+                output_path = output_dir / f"{safe_name}.png"
+                # Two tokens can match the same label; finish the earlier write first
+                # so the same file is never written concurrently (last token wins)
+                if output_path in write_jobs:
+                    write_jobs[output_path].result()
+                # token_img is a view into img, which is never modified, so it is
+                # safe to hand to a writer thread without copying
+                write_jobs[output_path] = writer.submit(cv2.imwrite, str(output_path), token_img,
+                                                        [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression])
+                
+                token_info = {
+                    'path': output_path,
+                    'name': token_name,
+                    'safe_name': safe_name,
+                    'shape': shape,
+                    'dimensions': {'width': w, 'height': h},
+                    'circularity': round(circularity, 3)
+                }
+                extracted_tokens.append(token_info)
+                
+                if debug:
+                    cv2.rectangle(debug_img, (x, y_actual), (x+w, y_actual+h), (0, 255, 0), 2)
+                    label = f"{safe_name[:15]}" if token_name != 'unknown' else str(idx)
+                    cv2.putText(debug_img, label, (x, y_actual-5), 
+                              cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+                
+                print(f"  ✓ Extracted: {token_name} ({shape}) -> {output_path.name}")
+        
+        # Surface any exceptions raised on the writer threads
+        for job in write_jobs.values():
+            job.result()
+        
+        if debug:
+            # Draw OCR text positions (once, not per token)
+            if token_names_ocr:
                 for (text_x, text_y), text in token_names_ocr.items():
                     cv2.circle(debug_img, (text_x, text_y), 5, (255, 0, 0), -1)
                     cv2.putText(debug_img, text[:20], (text_x + 10, text_y), 
                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 0, 0), 1)
-            print(f"  ✓ Extracted: {token_name} ({shape}) -> {output_path.name}")
-        
-        if debug:
+            
             # Draw line showing header skip region
             cv2.line(debug_img, (0, skip_pixels), (img_width, skip_pixels), (0, 0, 255), 2)
             cv2.putText(debug_img, "Header (ignored)", (10, skip_pixels - 10), 
@@ -658,6 +675,8 @@ def main():
     parser.add_argument('--debug', action='store_true', help='Save debug images')
     parser.add_argument('--output-dir', type=str, default='dev/extracted-tokens',
                        help='Output directory for extracted tokens')
+    parser.add_argument('--png-level', type=int, choices=range(10), default=1,
+                       help='PNG compression level for extracted tokens, 0-9 (default: 1)')
     
     args = parser.parse_args()
     
@@ -666,7 +685,7 @@ def main():
     
     # Setup
     output_base = Path(args.output_dir)
-    extractor = TokenExtractor(output_base)
+    extractor = TokenExtractor(output_base, png_compression=args.png_level)
     
     if args.team:
         # Process single team
@@ -677,17 +696,11 @@ def main():
     elif args.all:
         # Find all teams with marker guides
         print("Searching for teams with marker/token guides...")
-        teams = []
-        
-        for faction_dir in Path("output_v2").iterdir():
-            if faction_dir.is_dir():
-                for team_dir in faction_dir.iterdir():
-                    if team_dir.is_dir():
-                        faction_rules = team_dir / "faction-rules"
-                        if faction_rules.exists():
-                            marker_files = list(faction_rules.glob("*markertoken-guide*_front.jpg"))
-                            if marker_files:
-                                teams.append(team_dir.name)
+        # Single walk over output_v2/{faction}/{team}/faction-rules/
+        teams = {
+            marker_file.parent.parent.name
+            for marker_file in Path("output_v2").glob("*/*/faction-rules/*markertoken-guide*_front.jpg")
+        }
         
         print(f"Found {len(teams)} teams with marker guides")
         
@@ -2,6 +2,11 @@
 import json
 from pathlib import Path
 
+try:
+    from ._json_io import load_json, dump_json  # imported as part of the dev package
+except ImportError:
+    from _json_io import load_json, dump_json  # run as a script: dev/ is on sys.path
+
 # Map objects to their grid positions (1-10)
 # Grid layout:
 # 1      2      3      4      5
@@ -73,15 +78,13 @@ print(f"  Token bag at position 10 (rotated 90° left)")
 
 # Now update the Farstalker TTS object
 farstalker_path = Path("tts_objects/Farstalker Kinband Cards.json")
-with open(farstalker_path, 'r', encoding='utf-8') as f:
-    tts_data = json.load(f)
+tts_data = load_json(farstalker_path)
 
 # Update the LuaScriptState
 tts_data['ObjectStates'][0]['LuaScriptState'] = lua_state_json
 
 # Write back
-with open(farstalker_path, 'w', encoding='utf-8') as f:
-    json.dump(tts_data, f, indent=2)
+dump_json(tts_data, farstalker_path)
 
 print(f"\n✓ Updated {farstalker_path}")
 print(f"  All 8 objects in 2x5 grid with proper spacing")
@@ -7,12 +7,34 @@ for setup, placement, and recall of tokens.
 
 import argparse
 from pathlib import Path
+import functools
 import json
-import random
+import os
 import shutil
-import yaml
 from typing import Dict, List
 
+try:
+    from ._yaml_cache import load_yaml  # imported as part of the dev package
+except ImportError:
+    from _yaml_cache import load_yaml  # run as a script: dev/ is on sys.path
+
+try:
+    from ._json_io import load_json, dump_json  # imported as part of the dev package
+except ImportError:
+    from _json_io import load_json, dump_json  # run as a script: dev/ is on sys.path
+
+
+@functools.lru_cache(maxsize=1)
+def load_lua_script() -> str:
+    """Load Lua script from example file (read once per process)."""
+    lua_file = Path('dev/examples/token-bag-script.lua')
+    if lua_file.exists():
+        with open(lua_file) as f:
+            return f.read()
+    
+    # Fallback: return empty string if file doesn't exist
+    return ""
+
 
 class TeamTokenBagGenerator:
     """Generate team token bags with Lua script controls."""
@@ -23,29 +45,111 @@ class TeamTokenBagGenerator:
     # GitHub repo base URL
     GITHUB_BASE = "https://raw.githubusercontent.com/Wen-Qualtu/kt-datacards/main"
     
-    def __init__(self, team_config_path: Path = Path('config/team-config.yaml')):
+    # Constant sub-objects shared by every generated object; output-only, never mutated
+    ROT_UPRIGHT = {"x": 0.0, "y": 180.0, "z": 0.0}  # Right-side up
+    WHITE = {"r": 1.0, "g": 1.0, "b": 1.0}
+    WHITE_TRANSPARENT = {"r": 1.0, "g": 1.0, "b": 1.0, "a": 0.0}
+    
+    # Static fields of the team icon tile; per-team fields are set in generate_team_icon_tile.
+    # Nested dicts are shared between objects, so they must not be mutated.
+    ICON_TILE_TEMPLATE = {
+        "GUID": "",
+        "Name": "Custom_Tile",
+        "Transform": {
+            "posX": 0.0,
+            "posY": -0.5,
+            "posZ": 0.0,
+            "rotX": 0.0,
+            "rotY": 270.0,
+            "rotZ": 0.0,
+            "scaleX": 0.5,
+            "scaleY": 10.0,
+            "scaleZ": 0.5
+        },
+        "Nickname": "",
+        "Description": "",
+        "ColorDiffuse": WHITE,
+        "Locked": True,
+        "Grid": True,
+        "Snap": True,
+        "Autoraise": True,
+        "Sticky": True,
+        "Tooltip": True,
+        "Hands": False,
+        "CustomImage": {
+            "ImageURL": "",
+            "ImageSecondaryURL": "",
+            "ImageScalar": 1.0,
+            "WidthScale": 0.0,
+            "CustomTile": {
+                "Type": 0,
+                "Thickness": 0.1,
+                "Stackable": False,
+                "Stretch": True
+            }
+        }
+    }
+    
+    # Static fields of the team Custom_Model_Bag; per-team fields are set in generate_team_bag
+    TEAM_BAG_TEMPLATE = {
+        "GUID": "",
+        "Name": "Custom_Model_Bag",
+        "Transform": {
+            "posX": 0.0,
+            "posY": 1.01,
+            "posZ": 0.0,
+            "rotX": 0.0,
+            "rotY": 270.0,
+            "rotZ": 0.0,
+            "scaleX": 1.47,
+            "scaleY": 0.1,
+            "scaleZ": 1.47
+        },
+        "Nickname": "",
+        "Description": "If errors pop up, just wait for few sec and try again",
+        "GMNotes": "",
+        "ColorDiffuse": WHITE_TRANSPARENT,
+        "Tags": [],
+        "Locked": False,
+        "Grid": True,
+        "Snap": True,
+        "Autoraise": True,
+        "Sticky": True,
+        "Tooltip": True,
+        "Hands": False,
+        "Number": 0,
+        "CustomMesh": {
+            "MeshURL": BAG_MESH_URL,
+            "DiffuseURL": "",
+            "NormalURL": "",
+            "ColliderURL": "",
+            "Convex": True,
+            "MaterialIndex": 0,
+            "TypeIndex": 6,
+            "CastShadows": True
+        },
+        "Bag": {
+            "Order": 0
+        },
+        "LuaScript": "",
+        "LuaScriptState": "",
+        "ContainedObjects": [],
+        "ChildObjects": []
+    }
+    
+    def __init__(self, team_config_path: Path = Path('config/team-config.yaml'), verbose: bool = False):
         self.team_config_path = team_config_path
+        self.verbose = verbose
         self.team_config = self._load_team_config()
-        self.lua_script = self._load_lua_script()
+        self.lua_script = load_lua_script()
     
     def _load_team_config(self) -> Dict:
         """Load team configuration."""
         if not self.team_config_path.exists():
             return {}
         
-        with open(self.team_config_path) as f:
-            config = yaml.safe_load(f)
-            return config.get('teams', {})
-    
-    def _load_lua_script(self) -> str:
-        """Load Lua script from example file."""
-        lua_file = Path('dev/examples/token-bag-script.lua')
-        if lua_file.exists():
-            with open(lua_file) as f:
-                return f.read()
-        
-        # Fallback: return empty string if file doesn't exist
-        return ""
+        config = load_yaml(self.team_config_path)
+        return config.get('teams', {})
     
     def generate_lua_script_state(self, tokens: List[Dict]) -> str:
         """
@@ -72,55 +176,32 @@ class TeamTokenBagGenerator:
         token_spacing_z = 1.3  # Vertical spacing between tokens
         tokens_per_row = 3
         
-        # Round tokens on the left side
-        round_start_x = -3.5
-        round_start_z = -4.5
+        # Round tokens on the left side, operative tokens on the right
+        groups = [
+            ('Round', round_tokens, -3.5, -4.5),
+            ('Operative', operative_tokens, 1.0, -4.5)
+        ]
         
-        for i, token in enumerate(round_tokens):
-            row = i // tokens_per_row
-            col = i % tokens_per_row
+        for label, group_tokens, start_x, start_z in groups:
+            # Only tokens_per_row distinct x positions exist, so compute them once per group
+            col_xs = [round(start_x + (col * token_spacing_x), 4) for col in range(tokens_per_row)]
             
-            guid = token.get('GUID', 'unknown')
-            print(f"    Round token {i}: {token.get('Nickname', 'unknown')} GUID={guid}")
-            
-            memory_list[guid] = {
-                "lock": True,
-                "pos": {
-                    "x": round(round_start_x + (col * token_spacing_x), 4),
-                    "y": 0.0213,
-                    "z": round(round_start_z + (row * token_spacing_z), 4)
-                },
-                "rot": {
-                    "x": 0.0,
-                    "y": 180.0,  # Right-side up
-                    "z": 0.0
-                }
-            }
-        
-        # Operative tokens on the right side
-        operative_start_x = 1.0
-        operative_start_z = -4.5
-        
-        for i, token in enumerate(operative_tokens):
-            row = i // tokens_per_row
-            col = i % tokens_per_row
-            
-            guid = token.get('GUID', 'unknown')
-            print(f"    Operative token {i}: {token.get('Nickname', 'unknown')} GUID={guid}")
-            
-            memory_list[guid] = {
-                "lock": True,
-                "pos": {
-                    "x": round(operative_start_x + (col * token_spacing_x), 4),
-                    "y": 0.0213,
-                    "z": round(operative_start_z + (row * token_spacing_z), 4)
-                },
-                "rot": {
-                    "x": 0.0,
-                    "y": 180.0,  # Right-side up
-                    "z": 0.0
+            for i, token in enumerate(group_tokens):
+                row, col = divmod(i, tokens_per_row)
+                
+                guid = token.get('GUID', 'unknown')
+                if self.verbose:
+                    print(f"    {label} token {i}: {token.get('Nickname', 'unknown')} GUID={guid}")
+                
+                memory_list[guid] = {
+                    "lock": True,
+                    "pos": {
+                        "x": col_xs[col],
+                        "y": 0.0213,
+                        "z": round(start_z + (row * token_spacing_z), 4)
+                    },
+                    "rot": self.ROT_UPRIGHT
                 }
-            }
         
         print(f"  Generated LuaScriptState with {len(memory_list)} tokens")
         
@@ -139,49 +220,20 @@ class TeamTokenBagGenerator:
     
     def generate_guid(self) -> str:
         """Generate a random 6-character hexadecimal GUID."""
-        return ''.join(random.choices('0123456789abcdef', k=6))
+        return os.urandom(3).hex()
     
     def generate_team_icon_tile(self, team_name: str, faction: str) -> Dict:
         """Generate the Custom_Tile showing team icon."""
         icon_url = f"{self.GITHUB_BASE}/config/teams/{team_name}/tts-image/{team_name}-preview.png"
         
-        return {
-            "GUID": self.generate_guid(),
-            "Name": "Custom_Tile",
-            "Transform": {
-                "posX": 0.0,
-                "posY": -0.5,
-                "posZ": 0.0,
-                "rotX": 0.0,
-                "rotY": 270.0,
-                "rotZ": 0.0,
-                "scaleX": 0.5,
-                "scaleY": 10.0,
-                "scaleZ": 0.5
-            },
-            "Nickname": "",
-            "Description": "",
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0},
-            "Locked": True,
-            "Grid": True,
-            "Snap": True,
-            "Autoraise": True,
-            "Sticky": True,
-            "Tooltip": True,
-            "Hands": False,
-            "CustomImage": {
-                "ImageURL": icon_url,
-                "ImageSecondaryURL": icon_url,
-                "ImageScalar": 1.0,
-                "WidthScale": 0.0,
-                "CustomTile": {
-                    "Type": 0,
-                    "Thickness": 0.1,
-                    "Stackable": False,
-                    "Stretch": True
-                }
-            }
+        tile = self.ICON_TILE_TEMPLATE.copy()
+        tile["GUID"] = self.generate_guid()
+        tile["CustomImage"] = {
+            **self.ICON_TILE_TEMPLATE["CustomImage"],
+            "ImageURL": icon_url,
+            "ImageSecondaryURL": icon_url
         }
+        return tile
     
     def generate_team_bag(self,
                          team_name: str,
@@ -198,51 +250,15 @@ class TeamTokenBagGenerator:
         lua_script_state = self.generate_lua_script_state(token_bags)
         
         # Create bag with token infinite bags as contained objects
-        bag = {
-            "GUID": self.generate_guid(),
-            "Name": "Custom_Model_Bag",
-            "Transform": {
-                "posX": 0.0,
-                "posY": 1.01,
-                "posZ": 0.0,
-                "rotX": 0.0,
-                "rotY": 270.0,
-                "rotZ": 0.0,
-                "scaleX": 1.47,
-                "scaleY": 0.1,
-                "scaleZ": 1.47
-            },
-            "Nickname": f"{team_display} tokens",
-            "Description": "If errors pop up, just wait for few sec and try again",
-            "GMNotes": f"_{team_name}_tokens",
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0, "a": 0.0},
-            "Tags": [f"_{team_name}"],
-            "Locked": False,
-            "Grid": True,
-            "Snap": True,
-            "Autoraise": True,
-            "Sticky": True,
-            "Tooltip": True,
-            "Hands": False,
-            "Number": 0,
-            "CustomMesh": {
-                "MeshURL": self.BAG_MESH_URL,
-                "DiffuseURL": "",
-                "NormalURL": "",
-                "ColliderURL": "",
-                "Convex": True,
-                "MaterialIndex": 0,
-                "TypeIndex": 6,
-                "CastShadows": True
-            },
-            "Bag": {
-                "Order": 0
-            },
-            "LuaScript": self.lua_script,
-            "LuaScriptState": lua_script_state,
-            "ContainedObjects": token_bags,
-            "ChildObjects": [icon_tile]
-        }
+        bag = self.TEAM_BAG_TEMPLATE.copy()
+        bag["GUID"] = self.generate_guid()
+        bag["Nickname"] = f"{team_display} tokens"
+        bag["GMNotes"] = f"_{team_name}_tokens"
+        bag["Tags"] = [f"_{team_name}"]
+        bag["LuaScript"] = self.lua_script
+        bag["LuaScriptState"] = lua_script_state
+        bag["ContainedObjects"] = token_bags
+        bag["ChildObjects"] = [icon_tile]
         
         return bag
 
@@ -255,13 +271,15 @@ def main():
                        help='Directory with individual token JSON files')
     parser.add_argument('--output-dir', type=str, default='output_v2',
                        help='Output directory (default: output_v2)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                       help='Print the layout position of every token')
     
     args = parser.parse_args()
     
     tokens_dir = Path(args.tokens_dir) / args.team
     output_dir = Path(args.output_dir)
     
-    generator = TeamTokenBagGenerator()
+    generator = TeamTokenBagGenerator(verbose=args.verbose)
     
     print(f"\nGenerating team token bag for: {args.team}")
     print("=" * 60)
@@ -275,32 +293,33 @@ def main():
     team_output_dir = output_dir / faction / args.team / 'tts' / 'token'
     team_output_dir.mkdir(exist_ok=True, parents=True)
     
-    generator = TeamTokenBagGenerator()
-    
-    print(f"\nGenerating team token bag for: {args.team}")
-    print("=" * 60)
-    
     # Load all token bag objects
     token_bags = []
     if not tokens_dir.exists():
         print(f"Error: Token directory not found: {tokens_dir}")
         return
     
-    for json_file in sorted(tokens_dir.glob('*.json')):
-        with open(json_file) as f:
-            data = json.load(f)
-            # Extract the token from inside the bag (ContainedObjects)
-            if 'ObjectStates' in data and len(data['ObjectStates']) > 0:
-                bag_obj = data['ObjectStates'][0]
-                if 'ContainedObjects' in bag_obj and len(bag_obj['ContainedObjects']) > 0:
-                    # Get the actual token (not the infinite bag wrapper)
-                    token = bag_obj['ContainedObjects'][0]
-                    # Generate unique GUID for each token
-                    token['GUID'] = generator.generate_guid()
-                    # Add team tag to the token
-                    token['Tags'] = token.get('Tags', []) + [f"_{args.team}_tokens"]
-                    token_bags.append(token)
-                    print(f"  ✓ Loaded {json_file.stem}")
+    # scandir reports names and file types from a single directory read
+    with os.scandir(tokens_dir) as it:
+        json_entries = sorted((entry for entry in it
+                               if entry.name.endswith('.json') and entry.is_file()),
+                              key=lambda entry: entry.name)
+    
+    for entry in json_entries:
+        json_file = Path(entry.path)
+        data = load_json(json_file)
+        # Extract the token from inside the bag (ContainedObjects)
+        if 'ObjectStates' in data and len(data['ObjectStates']) > 0:
+            bag_obj = data['ObjectStates'][0]
+            if 'ContainedObjects' in bag_obj and len(bag_obj['ContainedObjects']) > 0:
+                # Get the actual token (not the infinite bag wrapper)
+                token = bag_obj['ContainedObjects'][0]
+                # Generate unique GUID for each token
+                token['GUID'] = generator.generate_guid()
+                # Add team tag to the token
+                token['Tags'] = token.get('Tags', []) + [f"_{args.team}_tokens"]
+                token_bags.append(token)
+                print(f"  ✓ Loaded {json_file.stem}")
     
     if not token_bags:
         print("Error: No token bags found")
@@ -332,8 +351,7 @@ def main():
     
     # Save team bag to output_v2
     output_file = team_output_dir / f"{args.team}-tokens.json"
-    with open(output_file, 'w') as f:
-        json.dump(tts_save, f, indent=2)
+    dump_json(tts_save, output_file)
     
     print(f"\n✓ Generated team bag with {len(token_bags)} tokens")
     print(f"Output: {output_file.absolute()}")
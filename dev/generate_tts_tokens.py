@@ -6,13 +6,72 @@ Each token gets its own .obj mesh file and TTS JSON object.
 """
 
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import json
-import random
-import shutil
-import yaml
+import os
 from typing import Dict, List, Optional
 
+try:
+    from ._yaml_cache import load_yaml  # imported as part of the dev package
+except ImportError:
+    from _yaml_cache import load_yaml  # run as a script: dev/ is on sys.path
+
+try:
+    from ._json_io import load_json, dump_json  # imported as part of the dev package
+except ImportError:
+    from _json_io import load_json, dump_json  # run as a script: dev/ is on sys.path
+
+
+def fast_copy(src: Path, dst: Path) -> None:
+    """
+    Copy a file using the kernel's zero-copy path where available.
+    
+    Skips the copy if dst already has the same size as src and is at least as new.
+    Only the timestamps are carried over (not the full metadata copy2 does).
+    """
+    src_stat = src.stat()
+    try:
+        dst_stat = dst.stat()
+        if os.path.samestat(src_stat, dst_stat):
+            # dst is a hard link to src: break the link rather than truncating src
+            dst.unlink()
+        elif dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime >= src_stat.st_mtime:
+            return
+    except FileNotFoundError:
+        pass
+    
+    try:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            remaining = src_stat.st_size
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+    except (AttributeError, OSError):
+        # No copy_file_range (non-Linux) or unsupported by the filesystem;
+        # shutil.copyfile still uses sendfile/fcopyfile where it can
+        import shutil
+        shutil.copyfile(src, dst)
+    
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def link_or_copy(src: Path, dst: Path) -> None:
+    """
+    Hard-link dst to src so identical files share one copy on disk.
+    
+    Falls back to fast_copy when linking is not possible (e.g. across devices,
+    or on filesystems without hard links).
+    """
+    try:
+        if dst.exists() and os.path.samefile(src, dst):
+            return
+        dst.unlink(missing_ok=True)
+        os.link(src, dst)
+    except OSError:
+        fast_copy(src, dst)
+
 
 class TTSTokenGenerator:
     """Generate TTS token objects and infinite bags."""
@@ -29,9 +88,117 @@ class TTSTokenGenerator:
     # GitHub repo base URL (from existing project)
     GITHUB_BASE = "https://raw.githubusercontent.com/Wen-Qualtu/kt-datacards/main"
     
-    def __init__(self, team_config_path: Path = Path('config/team-config.yaml')):
+    # Shared output-only values; never mutated after generation
+    WHITE = {"r": 1.0, "g": 1.0, "b": 1.0}
+    SHAPE_SCALES = {'round': 0.228, 'operative': 0.24}
+    SHAPE_TAGS = {
+        'round': ["KTUIMarker", "KTUIToken"],
+        'operative': ["KTUIToken", "KTUITokenSimple"]
+    }
+    
+    # Static fields of a Custom_Token; per-token fields are set in generate_token_object.
+    # Nested dicts are shared between tokens, so they must not be mutated.
+    TOKEN_TEMPLATE = {
+        "GUID": "",
+        "Name": "Custom_Token",
+        "Transform": {
+            "posX": 0.0,
+            "posY": 1.0,
+            "posZ": 0.0,
+            "rotX": 0.0,
+            "rotY": 180.0,
+            "rotZ": 0.0,
+            "scaleX": 1.0,
+            "scaleY": 1.0,
+            "scaleZ": 1.0
+        },
+        "Nickname": "",
+        "Description": "",
+        "GMNotes": "",
+        "AltLookAngle": {"x": 0.0, "y": 0.0, "z": 0.0},
+        "ColorDiffuse": WHITE,
+        "Tags": [],
+        "LayoutGroupSortIndex": 0,
+        "Value": 0,
+        "Locked": False,
+        "Grid": True,
+        "Snap": False,
+        "IgnoreFoW": False,
+        "MeasureMovement": False,
+        "DragSelectable": True,
+        "Autoraise": True,
+        "Sticky": False,
+        "Tooltip": False,
+        "GridProjection": False,
+        "HideWhenFaceDown": False,
+        "Hands": False,
+        "CustomImage": {
+            "ImageURL": "",
+            "ImageSecondaryURL": "",
+            "ImageScalar": 1.0,
+            "WidthScale": 0.0,
+            "CustomToken": {
+                "Thickness": 0.1,
+                "MergeDistancePixels": 5.0,
+                "StandUp": False,
+                "Stackable": False
+            }
+        },
+        "LuaScript": "",
+        "LuaScriptState": "",
+        "XmlUI": ""
+    }
+    
+    # Static fields of a Custom_Model_Infinite_Bag; per-token fields are set in generate_infinite_bag
+    INFINITE_BAG_TEMPLATE = {
+        "GUID": "",
+        "Name": "Custom_Model_Infinite_Bag",
+        "Transform": {
+            "posX": 0.0,
+            "posY": 1.03,
+            "posZ": 0.0,
+            "rotX": 0.0,
+            "rotY": 180.0,
+            "rotZ": 0.0,
+            "scaleX": 1.17,
+            "scaleY": 0.1,
+            "scaleZ": 1.13
+        },
+        "Nickname": "",
+        "Description": "",
+        "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0, "a": 0.0},
+        "Tags": ["KTUIToken"],
+        "Locked": False,
+        "Grid": True,
+        "Snap": True,
+        "Autoraise": True,
+        "Sticky": True,  # Sticky to keep in place
+        "Tooltip": True,
+        "Hands": False,
+        "CustomMesh": {
+            "MeshURL": "",
+            "DiffuseURL": "",
+            "NormalURL": "",
+            "ColliderURL": "",
+            "Convex": True,
+            "MaterialIndex": 0,
+            "TypeIndex": 7,
+            "CastShadows": True
+        },
+        "ContainedObjects": [],
+        "ChildObjects": []
+    }
+    
+    def __init__(self, team_config_path: Path = Path('config/team-config.yaml'), png_compression: int = 6):
         self.team_config_path = team_config_path
+        self.png_compression = png_compression
         self.team_config = self._load_team_config()
+        
+        # Resolve template meshes once; the same files back every token
+        self.mesh_paths = {shape: path.resolve()
+                           for shape, path in self.TEMPLATE_MESH_PATHS.items()
+                           if path.exists()}
+        self.bag_mesh = self.BAG_MESH_TEMPLATE.resolve() if self.BAG_MESH_TEMPLATE.exists() else None
     
     def _load_team_config(self) -> Dict:
         """Load team configuration to get faction information."""
@@ -39,9 +206,8 @@ class TTSTokenGenerator:
             print(f"Warning: Team config not found: {self.team_config_path}")
             return {}
         
-        with open(self.team_config_path) as f:
-            config = yaml.safe_load(f)
-            return config.get('teams', {})
+        config = load_yaml(self.team_config_path)
+        return config.get('teams', {})
     
     def get_faction(self, team_name: str) -> str:
         """Get faction for a team from config."""
@@ -50,7 +216,7 @@ class TTSTokenGenerator:
     
     def generate_guid(self) -> str:
         """Generate a random 6-character hexadecimal GUID."""
-        return ''.join(random.choices('0123456789abcdef', k=6))
+        return os.urandom(3).hex()
     
     def copy_mesh_to_output(self, shape: str, team_name: str, token_name: str, output_token_dir: Path) -> Path:
         """
@@ -69,17 +235,17 @@ class TTSTokenGenerator:
         if shape == 'complex':
             shape = 'operative'
         
-        template_mesh = self.TEMPLATE_MESH_PATHS[shape]
+        template_mesh = self.mesh_paths.get(shape)
         
-        if not template_mesh.exists():
-            raise FileNotFoundError(f"Template mesh not found: {template_mesh}")
+        if template_mesh is None:
+            raise FileNotFoundError(f"Template mesh not found: {self.TEMPLATE_MESH_PATHS[shape]}")
         
         # Create output filename: {team}-{token}.obj
         output_mesh = output_token_dir / f"{team_name}-{token_name}.obj"
         
-        # Copy the mesh file
+        # Link the mesh file (identical for every token of a shape)
         output_mesh.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(template_mesh, output_mesh)
+        link_or_copy(template_mesh, output_mesh)
         
         return output_mesh
     
@@ -100,68 +266,19 @@ class TTSTokenGenerator:
         Returns:
             TTS token object dict
         """
-        # Adjust scale based on shape
-        if shape == 'round':
-            scale = 0.228
-        else:
-            scale = 0.24
-        
-        # Set tags based on shape
-        if shape == 'round':
-            tags = ["KTUIMarker", "KTUIToken"]
-        else:
-            tags = ["KTUIToken", "KTUITokenSimple"]
-        
-        return {
-            "GUID": self.generate_guid(),
-            "Name": "Custom_Token",
-            "Transform": {
-                "posX": 0.0,
-                "posY": 1.0,
-                "posZ": 0.0,
-                "rotX": 0.0,
-                "rotY": 180.0,
-                "rotZ": 0.0,
-                "scaleX": scale,
-                "scaleY": 1.0,
-                "scaleZ": scale
-            },
-            "Nickname": token_name,
-            "Description": token_name,
-            "GMNotes": "",
-            "AltLookAngle": {"x": 0.0, "y": 0.0, "z": 0.0},
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0},
-            "Tags": tags,
-            "LayoutGroupSortIndex": 0,
-            "Value": 0,
-            "Locked": False,
-            "Grid": True,
-            "Snap": False,
-            "IgnoreFoW": False,
-            "MeasureMovement": False,
-            "DragSelectable": True,
-            "Autoraise": True,
-            "Sticky": False,
-            "Tooltip": False,
-            "GridProjection": False,
-            "HideWhenFaceDown": False,
-            "Hands": False,
-            "CustomImage": {
-                "ImageURL": token_texture_url,
-                "ImageSecondaryURL": "",
-                "ImageScalar": 1.0,
-                "WidthScale": 0.0,
-                "CustomToken": {
-                    "Thickness": 0.1,
-                    "MergeDistancePixels": 5.0,
-                    "StandUp": False,
-                    "Stackable": False
-                }
-            },
-            "LuaScript": "",
-            "LuaScriptState": "",
-            "XmlUI": ""
-        }
+        # Scale and tags depend on shape; anything but 'round' is an operative token
+        shape_key = 'round' if shape == 'round' else 'operative'
+        scale = self.SHAPE_SCALES[shape_key]
+        tags = self.SHAPE_TAGS[shape_key]
+        
+        token = self.TOKEN_TEMPLATE.copy()
+        token["GUID"] = self.generate_guid()
+        token["Transform"] = {**self.TOKEN_TEMPLATE["Transform"], "scaleX": scale, "scaleZ": scale}
+        token["Nickname"] = token_name
+        token["Description"] = token_name
+        token["Tags"] = tags
+        token["CustomImage"] = {**self.TOKEN_TEMPLATE["CustomImage"], "ImageURL": token_texture_url}
+        return token
     
     def generate_infinite_bag(self,
                              token_name: str,
@@ -198,7 +315,7 @@ class TTSTokenGenerator:
             },
             "Nickname": token_name,
             "Description": token_name,
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0},
+            "ColorDiffuse": self.WHITE,
             "Tags": token_obj.get('Tags', []),
             "Locked": False,
             "Grid": True,
@@ -227,7 +344,7 @@ class TTSTokenGenerator:
             },
             "Nickname": token_name,
             "Description": "",
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0},
+            "ColorDiffuse": self.WHITE,
             "Tags": token_obj.get('Tags', []),
             "Locked": False,
             "Grid": True,
@@ -239,46 +356,59 @@ class TTSTokenGenerator:
             "CustomImage": token_obj['CustomImage']
         }
         
-        return {
-            "GUID": self.generate_guid(),
-            "Name": "Custom_Model_Infinite_Bag",
-            "Transform": {
-                "posX": 0.0,
-                "posY": 1.03,
-                "posZ": 0.0,
-                "rotX": 0.0,
-                "rotY": 180.0,
-                "rotZ": 0.0,
-                "scaleX": 1.17,
-                "scaleY": 0.1,
-                "scaleZ": 1.13
-            },
-            "Nickname": token_name,
-            "Description": f"Infinite {token_name} tokens",
-            "ColorDiffuse": {"r": 1.0, "g": 1.0, "b": 1.0, "a": 0.0},
-            "Tags": ["KTUIToken"],
-            "Locked": False,
-            "Grid": True,
-            "Snap": True,
-            "Autoraise": True,
-            "Sticky": True,  # Sticky to keep in place
-            "Tooltip": True,
-            "Hands": False,
-            "CustomMesh": {
-                "MeshURL": mesh_url,
-                "DiffuseURL": "",
-                "NormalURL": "",
-                "ColliderURL": "",
-                "Convex": True,
-                "MaterialIndex": 0,
-                "TypeIndex": 7,
-                "CastShadows": True
-            },
-            "ContainedObjects": [contained_token],
-            "ChildObjects": [child_token_template]
-        }
+        bag = self.INFINITE_BAG_TEMPLATE.copy()
+        bag["GUID"] = self.generate_guid()
+        bag["Nickname"] = token_name
+        bag["Description"] = f"Infinite {token_name} tokens"
+        bag["CustomMesh"] = {**self.INFINITE_BAG_TEMPLATE["CustomMesh"], "MeshURL": mesh_url}
+        bag["ContainedObjects"] = [contained_token]
+        bag["ChildObjects"] = [child_token_template]
+        return bag
     
     
+    def copy_token_assets(self, source_image: Path, dest_image: Path, mesh_dest: Path) -> None:
+        """
+        Write a token's image and bag mesh into the output directory.
+        
+        Args:
+            source_image: Extracted token PNG
+            dest_image: Output path for the token PNG
+            mesh_dest: Output path for the token's bag mesh
+        """
+        if source_image.exists():
+            from PIL import Image
+            import numpy as np
+            
+            # Load image and boost alpha for colored pixels
+            img = Image.open(source_image)
+            if img.mode == 'RGBA':
+                img_array = np.array(img)
+                
+                # Get alpha channel
+                alpha = img_array[:, :, 3]
+                
+                # For pixels that are already somewhat visible (alpha > 50),
+                # make them fully opaque to preserve colors
+                # This prevents light colors from being treated as transparent
+                boosted_alpha = np.where(alpha > 50, 255, alpha)
+                
+                # Apply boosted alpha
+                img_array[:, :, 3] = boosted_alpha
+                
+                # Save with boosted alpha; unlink first so an output left hard-linked
+                # by an older run never writes through to the extracted image
+                img_boosted = Image.fromarray(img_array)
+                dest_image.unlink(missing_ok=True)
+                img_boosted.save(dest_image, 'PNG', compress_level=self.png_compression)
+            else:
+                # Not RGBA, just copy. A real copy, not a link: extract_tokens.py
+                # rewrites its PNGs in place, which must not touch the published output
+                fast_copy(source_image, dest_image)
+        
+        # Link bag mesh into output with token-specific name
+        if self.bag_mesh is not None:
+            link_or_copy(self.bag_mesh, mesh_dest)
+    
     def generate_individual_tokens(self,
                                   team_name: str,
                                   metadata_file: Path,
@@ -297,8 +427,7 @@ class TTSTokenGenerator:
             List of generated token data dicts
         """
         # Load extraction metadata
-        with open(metadata_file) as f:
-            metadata = json.load(f)
+        metadata = load_json(metadata_file)
         
         # Get faction for this team
         faction = self.get_faction(team_name)
@@ -309,88 +438,69 @@ class TTSTokenGenerator:
         output_token_dir.mkdir(parents=True, exist_ok=True)
         
         tokens = []
+        asset_jobs = []
         
-        for token_data in metadata['tokens']:
-            filename = token_data['filename']
-            token_name = token_data['name']
-            shape = token_data['shape']
-            
-            # Handle legacy 'complex' shape name
-            if shape == 'complex':
-                shape = 'operative'
-            
-            # Create clean token name for files
-            clean_name = filename.replace('.png', '')
-            
-            # Create token nickname
-            if token_name != 'unknown':
-                nickname = token_name
-            else:
-                nickname = clean_name.replace('-', ' ').title()
-            
-            # Copy extracted token image to output as PNG (KEEP TRANSPARENCY!)
-            source_image = token_images_dir / team_name / filename
-            dest_image = output_token_dir / f"{team_name}-{clean_name}.png"
-            
-            if source_image.exists():
-                from PIL import Image
-                import numpy as np
+        # Asset writes are independent, and Pillow/zlib/numpy release the GIL while
+        # decoding and encoding, so a thread pool scales with cores without pickling.
+        # The token objects are built on this thread meanwhile.
+        workers = max(1, min(len(metadata['tokens']), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for token_data in metadata['tokens']:
+                filename = token_data['filename']
+                token_name = token_data['name']
+                shape = token_data['shape']
+                
+                # Handle legacy 'complex' shape name
+                if shape == 'complex':
+                    shape = 'operative'
+                
+                # Create clean token name for files
+                clean_name = filename.replace('.png', '')
                 
-                # Load image and boost alpha for colored pixels
-                img = Image.open(source_image)
-                if img.mode == 'RGBA':
-                    img_array = np.array(img)
-                    
-                    # Get alpha channel
-                    alpha = img_array[:, :, 3]
-                    
-                    # For pixels that are already somewhat visible (alpha > 50),
-                    # make them fully opaque to preserve colors
-                    # This prevents light colors from being treated as transparent
-                    boosted_alpha = np.where(alpha > 50, 255, alpha)
-                    
-                    # Apply boosted alpha
-                    img_array[:, :, 3] = boosted_alpha
-                    
-                    # Save with boosted alpha
-                    img_boosted = Image.fromarray(img_array)
-                    img_boosted.save(dest_image, 'PNG')
+                # Create token nickname
+                if token_name != 'unknown':
+                    nickname = token_name
                 else:
-                    # Not RGBA, just copy
-                    shutil.copy2(source_image, dest_image)
-            
-            # Copy bag mesh to output with token-specific name
-            mesh_dest = output_token_dir / f"{team_name}-{clean_name}.obj"
-            if self.BAG_MESH_TEMPLATE.exists():
-                shutil.copy2(self.BAG_MESH_TEMPLATE, mesh_dest)
-            
-            # Generate URLs for texture and mesh
-            texture_url = f"{self.GITHUB_BASE}/output_v2/{faction}/{team_name}/tts/token/{dest_image.name}"
-            mesh_url = f"{self.GITHUB_BASE}/output_v2/{faction}/{team_name}/tts/token/{mesh_dest.name}"
-            
-            # Create token object
-            token_obj = self.generate_token_object(
-                token_name=nickname,
-                token_texture_url=texture_url,
-                shape=shape
-            )
-            
-            # Create infinite bag containing the token
-            bag = self.generate_infinite_bag(
-                token_name=nickname,
-                token_obj=token_obj,
-                token_image_url=texture_url,
-                mesh_url=mesh_url
-            )
-            
-            tokens.append({
-                'bag': bag,
-                'token': token_obj,
-                'filename': f"{clean_name}.json",
-                'token_name': nickname,
-                'shape': shape,
-                'image_path': dest_image
-            })
+                    nickname = clean_name.replace('-', ' ').title()
+                
+                # Copy extracted token image to output as PNG (KEEP TRANSPARENCY!)
+                source_image = token_images_dir / team_name / filename
+                dest_image = output_token_dir / f"{team_name}-{clean_name}.png"
+                
+                mesh_dest = output_token_dir / f"{team_name}-{clean_name}.obj"
+                asset_jobs.append(executor.submit(self.copy_token_assets, source_image, dest_image, mesh_dest))
+                
+                # Generate URLs for texture and mesh
+                texture_url = f"{self.GITHUB_BASE}/output_v2/{faction}/{team_name}/tts/token/{dest_image.name}"
+                mesh_url = f"{self.GITHUB_BASE}/output_v2/{faction}/{team_name}/tts/token/{mesh_dest.name}"
+                
+                # Create token object
+                token_obj = self.generate_token_object(
+                    token_name=nickname,
+                    token_texture_url=texture_url,
+                    shape=shape
+                )
+                
+                # Create infinite bag containing the token
+                bag = self.generate_infinite_bag(
+                    token_name=nickname,
+                    token_obj=token_obj,
+                    token_image_url=texture_url,
+                    mesh_url=mesh_url
+                )
+                
+                tokens.append({
+                    'bag': bag,
+                    'token': token_obj,
+                    'filename': f"{clean_name}.json",
+                    'token_name': nickname,
+                    'shape': shape,
+                    'image_path': dest_image
+                })
+        
+        # Surface any errors raised while writing assets
+        for job in asset_jobs:
+            job.result()
         
         return tokens
 
@@ -407,6 +517,8 @@ def main():
                        help='Output directory (default: output_v2)')
     parser.add_argument('--tts-json-dir', type=str, default='tts_objects/tokens',
                        help='Directory for standalone TTS JSON files (temp)')
+    parser.add_argument('--png-level', type=int, choices=range(10), default=6,
+                       help='PNG compression level for output tokens, 0-9 (default: 6; use 1 for quick dev runs)')
     
     args = parser.parse_args()
     
@@ -414,7 +526,7 @@ def main():
     output_dir = Path(args.output_dir)
     tts_json_dir = Path(args.tts_json_dir)
     
-    generator = TTSTokenGenerator()
+    generator = TTSTokenGenerator(png_compression=args.png_level)
     
     print(f"\nGenerating TTS tokens for: {args.team}")
     print("=" * 60)
@@ -471,8 +583,7 @@ def main():
                 "ObjectStates": [token_data['bag']]
             }
             
-            with open(json_output_file, 'w') as f:
-                json.dump(tts_save, f, indent=2)
+            dump_json(tts_save, json_output_file)
             
             print(f"  ✓ {token_data['token_name']} ({token_data['shape']})")
         